@@ -1,84 +1,84 @@
 import sounddevice as sd
 import numpy as np
-import queue
-import sys
+import logging
 import threading
 
-from config import settings # Import the settings instance
+from config import settings, SAMPLE_RATE, CHANNELS, DTYPE, CHUNK_SIZE, CHUNK_BYTES
+from ring_buffer import SPSCRingBuffer
 
-class AudioInputService:
-    _instance = None
-    _lock = threading.Lock()
+logger = logging.getLogger(__name__)
 
-    def __new__(cls):
-        if cls._instance is None:
-            with cls._lock:
-                # Double-check locking
-                if cls._instance is None:
-                    cls._instance = super(AudioInputService, cls).__new__(cls)
-                    cls._instance._initialized = False
-        return cls._instance
+class AudioInputService:
+    # Fixed attribute layout; avoids a per-instance __dict__ on the callback path
+    __slots__ = ('ring_buffer', '_slots', '_stream', '_stop_event', '_thread')
 
     def __init__(self):
-        if self._initialized:
-            return
-        with self._lock:
-            if self._initialized:
-                return
-            self.frames_queue = queue.Queue()
-            self._stream = None
-            self._stop_event = threading.Event()
-            self._thread = None
-            self._initialized = True
-            print("AudioInputService initialized.")
+        # Lock-free buffer between the realtime callback and the chunker; it
+        # wakes the chunker every RING_WAKE_CHUNKS blocks rather than per block
+        self.ring_buffer = SPSCRingBuffer(
+            settings.RING_BUFFER_CHUNKS * CHUNK_BYTES,
+            wake_threshold=settings.RING_WAKE_CHUNKS * CHUNK_BYTES
+        )
+        # One (CHUNK_SIZE, CHANNELS) array view per block-sized slot of the
+        # ring, computed once so the callback doesn't create any objects
+        self._slots = list(np.frombuffer(self.ring_buffer.buffer, dtype=DTYPE).reshape(-1, CHUNK_SIZE, CHANNELS))
+        self._stream = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        logger.debug("AudioInputService initialized.")
 
     def _audio_callback(self, indata, frame_count, time_info, status):
         if status:
-            print(f"Audio Callback Status: {status}", file=sys.stderr)
-        # Ensure data is in the correct format (bytes of int16)
-        if indata.dtype == np.float32:
-             # Assuming the input range is [-1.0, 1.0] for float32
-             indata_int16 = (indata * 32767).astype(settings.DTYPE)
-        elif indata.dtype == settings.DTYPE:
-             indata_int16 = indata
-        else:
-             print(f"Warning: Unexpected audio input dtype {indata.dtype}. Attempting conversion.", file=sys.stderr)
-             # Attempt conversion, might fail or be incorrect
-             indata_int16 = indata.astype(settings.DTYPE)
-
-        self.frames_queue.put(indata_int16.tobytes())
+            logger.warning("Audio Callback Status: %s", status)
+        ring = self.ring_buffer
+        position = ring.write_position()
+        if frame_count == CHUNK_SIZE and position % CHUNK_BYTES == 0 and ring.free_space() >= CHUNK_BYTES:
+            # Fast path: the stream delivers exactly one block per call, so it
+            # fills one whole slot. No locking and no buffer/view allocation.
+            np.copyto(self._slots[position // CHUNK_BYTES], indata)
+            ring.commit_write(CHUNK_BYTES)
+        elif not ring.write_from(indata):
+            logger.warning("Audio ring buffer full, dropping input block.")
 
     def start(self):
         if self._thread is not None and self._thread.is_alive():
-            print("Audio input service already running.")
+            logger.info("Audio input service already running.")
             return
 
-        print("Starting audio input service...")
+        logger.info("Starting audio input service...")
         self._stop_event.clear()
         try:
             self._stream = sd.InputStream(
-                samplerate=settings.SAMPLE_RATE,
-                blocksize=settings.CHUNK_SIZE,
-                channels=settings.CHANNELS,
-                dtype=settings.DTYPE,
+                samplerate=SAMPLE_RATE,
+                blocksize=CHUNK_SIZE,
+                channels=CHANNELS,
+                dtype=DTYPE,
+                latency='low',
                 callback=self._audio_callback
             )
+            # The callback copies raw samples without converting them, so the
+            # stream must deliver exactly the storage dtype.
+            actual_dtype = np.dtype(self._stream.dtype)
+            if actual_dtype != np.dtype(DTYPE):
+                self._stream.close()
+                self._stream = None
+                raise RuntimeError(f"Audio stream opened with dtype {actual_dtype}, expected {np.dtype(DTYPE)}.")
             self._stream.start()
-            print("Audio stream started.")
+            logger.info("Audio stream started.")
         except Exception as e:
-            print(f"Error starting audio stream: {e}", file=sys.stderr)
+            logger.error("Error starting audio stream: %s", e)
             # Potentially re-raise or handle more gracefully
             raise
 
     def stop(self):
-        print("Stopping audio input service...")
+        logger.info("Stopping audio input service...")
         if self._stream:
             try:
                 self._stream.stop()
                 self._stream.close()
-                print("Audio stream stopped and closed.")
+                logger.info("Audio stream stopped and closed.")
             except Exception as e:
-                print(f"Error stopping audio stream: {e}", file=sys.stderr)
+                logger.error("Error stopping audio stream: %s", e)
             finally:
                 self._stream = None
         # Signal the callback loop to exit if it were in a thread
@@ -86,8 +86,8 @@ class AudioInputService:
         # No separate thread managing the stream directly in this sd.InputStream model
         # The callback runs in sounddevice's thread context.
 
-    def get_queue(self):
-        return self.frames_queue
+    def get_ring_buffer(self):
+        return self.ring_buffer
 
 # Singleton instance
 audio_input_service = AudioInputService() 
\ No newline at end of file
@@ -1,127 +1,215 @@
 import threading
-import queue
 import datetime
-import sys
-import math # For ceiling calculation if needed, though logic uses TARGET_CHUNKS_PER_FILE
+import os
+import logging
+import concurrent.futures
 
-from config import settings # Import the settings instance
+from config import settings, SAMPLE_RATE, CHANNELS, ITEMSIZE, CHUNK_BYTES, TARGET_CHUNKS_PER_FILE
 from audio_input import audio_input_service
 from audio_storage import audio_storage_service
 
-class ChunkingProcessorService:
-    _instance = None
-    _lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+# SCHED_FIFO priority for the processing thread when REALTIME_PRIORITY is on
+REALTIME_THREAD_PRIORITY = 10
 
-    def __new__(cls):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super(ChunkingProcessorService, cls).__new__(cls)
-                    cls._instance._initialized = False
-        return cls._instance
+# How far the sample-count clock may drift from the wall clock before a new
+# chunk is re-anchored to datetime.now()
+MAX_CLOCK_DRIFT = datetime.timedelta(seconds=1)
+
+class ChunkingProcessorService:
+    # Fixed attribute layout; the drain loop reads and writes the chunk state per span
+    __slots__ = (
+        'ring_buffer', '_chunk_capacity', '_bytes_per_second',
+        'current_chunk_buffer', 'current_chunk_bytes', '_free_buffers',
+        'start_time', '_next_start_time', '_stop_event', '_processing_thread',
+        '_io_pool', '_last_save',
+    )
 
     def __init__(self):
-        if self._initialized:
-            return
-        with self._lock:
-            if self._initialized:
-                return
-            self.input_queue = audio_input_service.get_queue()
-            # List to store frames for the current chunk
-            self.current_chunk_frames = []
-            self.start_time = None
-            self._stop_event = threading.Event()
-            self._processing_thread = None
-            self._initialized = True
-            print("ChunkingProcessorService initialized.")
+        self.ring_buffer = audio_input_service.get_ring_buffer()
+        # Size of one complete output file's audio, in bytes
+        self._chunk_capacity = TARGET_CHUNKS_PER_FILE * CHUNK_BYTES
+        self._bytes_per_second = SAMPLE_RATE * CHANNELS * ITEMSIZE
+        # Pre-allocated buffer holding the current chunk's audio, and how
+        # much of it is filled
+        self.current_chunk_buffer = None
+        self.current_chunk_bytes = 0
+        # Chunk buffers whose save has finished, ready for reuse. Appended by
+        # the writer thread, popped by the processing thread (both atomic).
+        self._free_buffers = []
+        self.start_time = None
+        # Expected wall-clock start of the next chunk: where the previous one
+        # ended. Checked against datetime.now() at every chunk start.
+        self._next_start_time = None
+        self._stop_event = threading.Event()
+        self._processing_thread = None
+        # Single writer thread so encoding/compressing a finished chunk
+        # never blocks draining of the ring buffer. One worker also keeps
+        # the saves in order.
+        self._io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="chunk-writer")
+        self._last_save = None
+        logger.debug("ChunkingProcessorService initialized.")
 
     def _process_audio(self):
-        """Processes audio frames from the queue, chunking them by duration."""
-        print("Chunking processing thread started.")
-        while not self._stop_event.is_set():
+        """Drains audio from the ring buffer, chunking it by duration."""
+        logger.info("Chunking processing thread started.")
+        # Bind everything the drain loop touches to locals once; they are
+        # fixed for the life of the thread
+        stop_event = self._stop_event
+        wait = self.ring_buffer.wait
+        read_available = self.ring_buffer.read_available
+        advance_read = self.ring_buffer.advance_read
+        chunk_capacity = self._chunk_capacity
+
+        while not stop_event.is_set():
+            # Block until the producer writes; stop() wakes us explicitly.
+            # Whatever is buffered is still drained once before exiting.
+            wait()
             try:
-                # Get frame with a timeout to allow checking stop_event
-                frame = self.input_queue.get(timeout=0.1)
-
-                # Record start time if this is the first frame of a new chunk
-                if not self.start_time:
-                    self.start_time = datetime.datetime.now()
-                    # Adjust start time slightly back to account for the first chunk's duration?
-                    # Or consider start time as the moment the *first* byte arrives for the chunk.
-                    # Let's keep it simple: start_time = first frame arrival time.
-                    print(f"Starting new chunk at {self.start_time.strftime('%Y-%m-%d_%H-%M-%S')}")
-
-                self.current_chunk_frames.append(frame)
-
-                # Check if the chunk has reached the target size
-                if len(self.current_chunk_frames) >= settings.TARGET_CHUNKS_PER_FILE:
-                    end_time = datetime.datetime.now()
-                    print(f"Chunk complete at {end_time.strftime('%Y-%m-%d_%H-%M-%S')}. Saving...")
-                    self._save_current_chunk(end_time)
-                    self._reset_chunk_state() # Reset for the next chunk
-
-            except queue.Empty:
-                # Queue is empty, just continue waiting for frames
-                # Check if we should save a partial chunk on timeout/stop? - Handled in stop()
-                continue
+                while True:
+                    view = read_available()
+                    if not view:
+                        break # Ring drained, wait for the producer again
+
+                    # Record start time if this is the first data of a new chunk
+                    if not self.start_time:
+                        self.start_time = self._chunk_start_time()
+                        # Reuse a buffer from a finished save; only the first
+                        # couple of chunks ever allocate
+                        free_buffers = self._free_buffers
+                        self.current_chunk_buffer = free_buffers.pop() if free_buffers else bytearray(chunk_capacity)
+                        logger.debug("Starting new chunk at %s", self.start_time)
+
+                    # Never take more than the current chunk still needs
+                    offset = self.current_chunk_bytes
+                    size = min(len(view), chunk_capacity - offset)
+                    self.current_chunk_buffer[offset:offset + size] = view[:size]
+                    self.current_chunk_bytes = offset + size
+                    advance_read(size)
+
+                    # Check if the chunk has reached the target size
+                    if offset + size >= chunk_capacity:
+                        logger.debug("Chunk complete. Saving...")
+                        end_time = self._chunk_end_time()
+                        self._save_current_chunk(end_time)
+                        self._reset_chunk_state() # Reset for the next chunk
+                        self._next_start_time = end_time # Chunks are back to back
+
             except Exception as e:
-                 print(f"Error during chunk processing: {e}", file=sys.stderr)
+                 logger.exception("Error during chunk processing: %s", e)
                  # Decide if we should reset or try to continue
                  self._reset_chunk_state() # Reset state on error to avoid saving corrupted chunk
-
-        print("Chunking processing thread stopped.")
+                 self._next_start_time = None # Audio was discarded, re-anchor the clock
+
+        logger.info("Chunking processing thread stopped.")
+
+    def _chunk_start_time(self):
+        """Wall-clock start of a new chunk.
+
+        Consecutive chunks are back to back, so normally a chunk starts where
+        the previous one ended. The clock is still read once per chunk: if
+        that has drifted from it by more than MAX_CLOCK_DRIFT (sound card
+        clock drift, dropped audio, the system clock being set by NTP), the
+        chunk is re-anchored to the wall clock.
+        """
+        # The audio still waiting in the ring was captured before now
+        buffered = datetime.timedelta(seconds=self.ring_buffer.readable() / self._bytes_per_second)
+        observed = datetime.datetime.now() - buffered
+        expected = self._next_start_time
+        if expected is None:
+            return observed
+        if abs(observed - expected) > MAX_CLOCK_DRIFT:
+            logger.info("Chunk clock is %.1fs off the wall clock, re-anchoring.", (expected - observed).total_seconds())
+            return observed
+        return expected
+
+    def _chunk_end_time(self):
+        """Wall-clock end of the current chunk, computed from the amount of audio in it.
+
+        Makes file names match the audio they contain exactly; drift across
+        chunks is corrected by _chunk_start_time.
+        """
+        seconds = self.current_chunk_bytes / self._bytes_per_second
+        return self.start_time + datetime.timedelta(seconds=seconds)
 
     def _save_current_chunk(self, end_time):
-        """Internal helper to save the current chunk list."""
-        if not self.start_time or not self.current_chunk_frames:
-            print("Save called but no data/start time for the current chunk.")
+        """Internal helper to save the current chunk buffer."""
+        if not self.start_time or not self.current_chunk_bytes:
+            logger.warning("Save called but no data/start time for the current chunk.")
             return
 
-        # Use the current_chunk_frames list
-        # The audio_storage_service needs a list of byte frames
-        audio_storage_service.save_recording(
-            self.current_chunk_frames,
-            self.start_time,
-            end_time
+        # Format the filename (without extension) exactly once per chunk
+        base_filename = f"{self.start_time:%Y%m%d_%H%M%S}_to_{end_time:%H%M%S}"
+
+        # Hand the buffer over to the writer thread; _reset_chunk_state
+        # re-binds current_chunk_buffer, so the worker owns it until the save
+        # is done and it goes back to the free list
+        chunk_buffer = self.current_chunk_buffer
+        self._last_save = self._io_pool.submit(
+            audio_storage_service.save_recording,
+            memoryview(chunk_buffer)[:self.current_chunk_bytes],
+            base_filename
         )
+        self._last_save.add_done_callback(lambda _: self._free_buffers.append(chunk_buffer))
 
     def _reset_chunk_state(self):
         """Resets the state for the next chunk."""
-        self.current_chunk_frames = []
+        self.current_chunk_buffer = None # Taken from the free list when the next chunk starts
+        self.current_chunk_bytes = 0
         self.start_time = None
-        print(f"Resetting chunk state. Waiting for next {settings.CHUNK_DURATION_MINUTES} minute chunk...")
+        logger.debug("Resetting chunk state. Waiting for next %d minute chunk...", settings.CHUNK_DURATION_MINUTES)
 
 
     def start(self):
         if self._processing_thread is not None and self._processing_thread.is_alive():
-            print("Chunking processing service already running.")
+            logger.info("Chunking processing service already running.")
             return
 
-        print("Starting Chunking processing service...")
+        logger.info("Starting Chunking processing service...")
         self._stop_event.clear()
         self._reset_chunk_state() # Ensure clean state on start
+        self._next_start_time = None
         self._processing_thread = threading.Thread(target=self._process_audio, daemon=True)
         self._processing_thread.start()
+        if settings.REALTIME_PRIORITY:
+            self._set_realtime_priority()
+
+    def _set_realtime_priority(self):
+        """Moves the processing thread to SCHED_FIFO so it keeps up with the audio callback under load."""
+        try:
+            os.sched_setscheduler(self._processing_thread.native_id, os.SCHED_FIFO, os.sched_param(REALTIME_THREAD_PRIORITY))
+            logger.info("Chunking processing thread set to SCHED_FIFO priority %d.", REALTIME_THREAD_PRIORITY)
+        except (AttributeError, OSError) as e:
+            # Not Linux, or missing CAP_SYS_NICE / rtprio limit
+            logger.warning("Could not set realtime priority for chunking thread: %s", e)
 
     def stop(self):
-        print("Stopping Chunking processing service...")
+        logger.info("Stopping Chunking processing service...")
         self._stop_event.set() # Signal the processing loop to stop
+        self.ring_buffer.wake() # Unblock it if it is waiting for audio
         if self._processing_thread:
             self._processing_thread.join(timeout=1.0) # Wait briefly for thread
             if self._processing_thread.is_alive():
-                print("Warning: Chunking processing thread did not stop gracefully.", file=sys.stderr)
+                logger.warning("Chunking processing thread did not stop gracefully.")
 
         # Save any remaining partial chunk when stopping
-        if self.current_chunk_frames:
-            print("Saving final partial chunk...")
-            # Estimate end time if not naturally completed
-            end_time = datetime.datetime.now()
+        if self.current_chunk_bytes:
+            logger.info("Saving final partial chunk...")
+            end_time = self._chunk_end_time()
             self._save_current_chunk(end_time)
 
         # Reset state after stopping and potentially saving
         self._reset_chunk_state()
+
+        # Saves run in order on a single worker, so the last one finishing
+        # means every queued chunk is on disk
+        if self._last_save:
+            logger.info("Waiting for pending chunk saves to finish...")
+            concurrent.futures.wait([self._last_save])
+            self._last_save = None
         self._processing_thread = None
-        print("ChunkingProcessorService stopped.")
+        logger.info("ChunkingProcessorService stopped.")
 
 # Singleton instance
 chunking_processor_service = ChunkingProcessorService() 
\ No newline at end of file
@@ -1,7 +1,12 @@
 import numpy as np
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import Field, computed_field
-import math # Added for ceiling calculation
+from pydantic import Field, computed_field, field_validator
+from typing import Literal
+from functools import cached_property
+
+# Numpy data type for recording. Invariant, so a plain constant rather than a
+# setting: reading it is a module attribute lookup, not a descriptor call.
+DTYPE = np.int16
 
 class Settings(BaseSettings):
     # Load settings from a .env file
@@ -11,34 +16,51 @@ class Settings(BaseSettings):
     SAMPLE_RATE: int = Field(16000, description="Audio sample rate in Hz.")
     CHUNK_DURATION_MS: int = Field(30, description="Duration of audio chunks processed internally (ms).")
     CHANNELS: int = Field(2, description="Number of audio channels")
-    # DTYPE is derived, not directly loaded
+    # DTYPE is a module constant, not loaded
 
     # --- Recording Configuration ---
     CHUNK_DURATION_MINUTES: int = Field(5, description="Duration of each saved audio chunk in minutes.")
 
+    # --- Buffering Configuration ---
+    RING_BUFFER_CHUNKS: int = Field(1000, description="Capacity of the audio input ring buffer, in internal chunks.")
+    RING_WAKE_CHUNKS: int = Field(32, description="Internal chunks to accumulate before waking the chunking thread.")
+
+    # --- Scheduling Configuration ---
+    REALTIME_PRIORITY: bool = Field(False, description="Run the chunking thread with SCHED_FIFO and lock process memory (Linux, needs CAP_SYS_NICE/CAP_IPC_LOCK).")
+
+    # --- Logging Configuration ---
+    LOG_LEVEL: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = Field("INFO", description="Logging level for the listening service (case-insensitive).")
+
     # --- Output Configuration ---
     OUTPUT_DIR: str = Field("recordings", description="Directory to save recordings")
+    RECORDING_FORMAT: Literal["wav.zst", "wav.gz", "flac"] = Field("wav.zst", description="File format (and extension) of saved recordings. 'flac' needs soundfile.")
+
+    @field_validator("LOG_LEVEL", mode="before")
+    @classmethod
+    def _upper_log_level(cls, value):
+        return value.upper() if isinstance(value, str) else value
 
     # --- Computed Fields ---
+    # Cached: the inputs never change after startup
     @computed_field
-    @property
+    @cached_property
     def CHUNK_SIZE(self) -> int:
         "Size of each audio chunk in frames."
-        return int(self.SAMPLE_RATE * self.CHUNK_DURATION_MS / 1000)
+        return self.SAMPLE_RATE * self.CHUNK_DURATION_MS // 1000
 
     @computed_field
-    @property
-    def DTYPE(self) -> np.dtype:
-        "Numpy data type for recording."
-        return np.int16
+    @cached_property
+    def CHUNK_BYTES(self) -> int:
+        "Size of each audio chunk in bytes (all channels)."
+        return self.CHUNK_SIZE * self.CHANNELS * np.dtype(DTYPE).itemsize
 
     @computed_field
-    @property
+    @cached_property
     def TARGET_CHUNKS_PER_FILE(self) -> int:
         "Target number of internal chunks per output file."
         total_ms_per_file = self.CHUNK_DURATION_MINUTES * 60 * 1000
-        # Use ceiling to ensure we capture the full duration
-        return math.ceil(total_ms_per_file / self.CHUNK_DURATION_MS)
+        # Integer ceiling division to ensure we capture the full duration
+        return (total_ms_per_file + self.CHUNK_DURATION_MS - 1) // self.CHUNK_DURATION_MS
 
 
 
@@ -51,6 +73,20 @@ def validate_settings():
         raise ValueError("CHUNK_DURATION_MS must be positive.")
     if settings.CHUNK_DURATION_MINUTES <= 0:
         raise ValueError("CHUNK_DURATION_MINUTES must be positive.")
+    if settings.RING_BUFFER_CHUNKS <= 0:
+        raise ValueError("RING_BUFFER_CHUNKS must be positive.")
+    if not 0 < settings.RING_WAKE_CHUNKS <= settings.RING_BUFFER_CHUNKS:
+        raise ValueError("RING_WAKE_CHUNKS must be between 1 and RING_BUFFER_CHUNKS.")
 
 # Run validation when the module is imported
-validate_settings() 
\ No newline at end of file
+validate_settings()
+
+# --- Derived Constants ---
+# Plain module-level copies of the values used on the audio path, bound once
+# after validation so hot code doesn't go through the computed properties.
+SAMPLE_RATE = settings.SAMPLE_RATE
+CHANNELS = settings.CHANNELS
+ITEMSIZE = np.dtype(DTYPE).itemsize
+CHUNK_SIZE = settings.CHUNK_SIZE
+CHUNK_BYTES = settings.CHUNK_BYTES
+TARGET_CHUNKS_PER_FILE = settings.TARGET_CHUNKS_PER_FILE
@@ -0,0 +1,36 @@
+import logging
+import logging.handlers
+import queue
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s"
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that enqueues records as they are.
+
+    The stock prepare() merges the message and formats any traceback on the
+    logging thread so records can cross process boundaries. The queue here
+    stays in-process, so leave all of that to the listener's formatter.
+    """
+
+    def prepare(self, record):
+        return record
+
+def start_logging(level):
+    """Routes all logging through a queue drained by a background thread.
+
+    Threads that log (including the audio callback) only pay for creating
+    and enqueuing the record; formatting it and writing to the terminal
+    happen on the listener's thread.
+    Returns the QueueListener, which should be stopped on shutdown to flush
+    any pending records.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers[:] = [_RecordQueueHandler(log_queue)]
+    listener.start()
+    return listener
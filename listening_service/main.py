@@ -1,51 +1,79 @@
 import time
 import signal
-import sys
+import ctypes
+import os
+import logging
 
-# Import the singleton service instances and settings
+from config import settings # Import the settings instance
+from logging_setup import start_logging
+
+# Configure logging before importing the services: they create their
+# singleton instances (and log) at import time.
+log_listener = start_logging(settings.LOG_LEVEL)
+
+# Import the singleton service instances
 from audio_input import audio_input_service
 from chunking_processor import chunking_processor_service
-from config import settings # Import the settings instance
+
+logger = logging.getLogger(__name__)
 
 running = True
 
+# mlockall() flags from <sys/mman.h> (Linux)
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
 def signal_handler(sig, frame):
     """Handles Ctrl+C interruption gracefully."""
     global running
-    print('\nInterrupt received, shutting down services...')
+    logger.info("Interrupt received, shutting down services...")
     running = False
 
+def lock_memory():
+    """Locks current and future pages in RAM so the audio path never page-faults."""
+    try:
+        libc = ctypes.CDLL("libc.so.6", use_errno=True)
+        if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        logger.info("Process memory locked (mlockall).")
+    except OSError as e:
+        logger.warning("Could not lock process memory: %s", e)
+
 def main():
     global running
-    print("Starting application...")
+    logger.info("Starting application...")
     # Access settings via the imported object
-    print(f"Configuration: Sample Rate={settings.SAMPLE_RATE}, Chunk={settings.CHUNK_DURATION_MS}ms, Output='{settings.OUTPUT_DIR}', Save Chunk Minutes={settings.CHUNK_DURATION_MINUTES}")
+    logger.info("Configuration: Sample Rate=%d, Chunk=%dms, Output='%s', Save Chunk Minutes=%d",
+                settings.SAMPLE_RATE, settings.CHUNK_DURATION_MS, settings.OUTPUT_DIR, settings.CHUNK_DURATION_MINUTES)
 
     # Setup signal handler for graceful shutdown
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
+    if settings.REALTIME_PRIORITY:
+        lock_memory()
+
     try:
         # Start the services
         audio_input_service.start()
         chunking_processor_service.start()
 
-        print(f"#{'='*30}")
-        print(" Application running. Press Ctrl+C to stop.")
-        print(f"#{'='*30}")
+        logger.info("Application running. Press Ctrl+C to stop.")
 
         # Keep the main thread alive
         while running:
             time.sleep(1) # Sleep to prevent busy-waiting
 
     except Exception as e:
-        print(f"An unexpected error occurred in main: {e}", file=sys.stderr)
+        logger.exception("An unexpected error occurred in main: %s", e)
     finally:
-        print("Initiating shutdown...")
+        logger.info("Initiating shutdown...")
         # Stop services in reverse order of dependency/start
         chunking_processor_service.stop()
         audio_input_service.stop()
-        print("Application shutdown complete.")
+        logger.info("Application shutdown complete.")
+        log_listener.stop() # Flush any queued log records
 
 if __name__ == "__main__":
     main()
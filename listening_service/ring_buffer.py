@@ -0,0 +1,108 @@
+import threading
+
+class SPSCRingBuffer:
+    """Fixed-size, single-producer/single-consumer byte ring buffer.
+
+    The producer (the audio callback) only ever advances ``_head`` and the
+    consumer (the chunking thread) only ever advances ``_tail``. Both are
+    monotonically increasing byte counters; a single attribute store is atomic
+    under the GIL, so the data copy is always complete before the new index is
+    published and neither side needs a lock.
+    """
+
+    # Touched from the audio callback on every block; no per-instance __dict__
+    __slots__ = (
+        '_capacity', '_wake_threshold', '_buffer', '_view',
+        '_head', '_tail', 'dropped_bytes', 'data_ready',
+    )
+
+    def __init__(self, capacity, wake_threshold=1):
+        if capacity <= 0:
+            raise ValueError("Ring buffer capacity must be positive.")
+        if not 0 < wake_threshold <= capacity:
+            raise ValueError("Wake threshold must be between 1 and the capacity.")
+        self._capacity = capacity
+        # The consumer is only signalled once this many bytes are readable
+        self._wake_threshold = wake_threshold
+        self._buffer = bytearray(capacity) # Pre-allocated once, never resized
+        self._view = memoryview(self._buffer)
+        self._head = 0 # Total bytes written (producer-owned)
+        self._tail = 0 # Total bytes read (consumer-owned)
+        self.dropped_bytes = 0
+        self.data_ready = threading.Event()
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def buffer(self):
+        """The underlying storage, e.g. for pre-computing views over fixed slots."""
+        return self._buffer
+
+    def readable(self):
+        """Bytes written but not yet read."""
+        return self._head - self._tail
+
+    def free_space(self):
+        return self._capacity - (self._head - self._tail)
+
+    def write_position(self):
+        """Offset in the buffer where the next write starts."""
+        return self._head % self._capacity
+
+    def commit_write(self, size):
+        """Publishes `size` bytes the producer already copied in at write_position()."""
+        self._head += size
+        # Batch wake-ups: below the threshold the consumer keeps sleeping
+        if self._head - self._tail >= self._wake_threshold:
+            self.data_ready.set()
+
+    def write_from(self, data):
+        """Copies a buffer-protocol object (bytes, ndarray, ...) into the ring.
+
+        Returns False and drops the data if there is not enough free space.
+        """
+        src = memoryview(data).cast('B')
+        size = src.nbytes
+        head = self._head
+        if size > self._capacity - (head - self._tail):
+            self.dropped_bytes += size
+            return False
+
+        start = head % self._capacity
+        first = min(size, self._capacity - start)
+        self._view[start:start + first] = src[:first]
+        if first < size:
+            # Wrap around to the beginning of the buffer
+            self._view[:size - first] = src[first:]
+
+        self.commit_write(size) # Publish only after the copy is complete
+        return True
+
+    def read_available(self):
+        """Returns a memoryview over the contiguous readable region (possibly empty).
+
+        If the readable data wraps past the end of the buffer only the first
+        segment is returned; the remainder is returned by the next call once
+        the first one has been released with advance_read().
+        """
+        tail = self._tail
+        start = tail % self._capacity
+        size = min(self._head - tail, self._capacity - start)
+        return self._view[start:start + size]
+
+    def advance_read(self, size):
+        """Releases `size` bytes previously returned by read_available()."""
+        self._tail += size
+
+    def wake(self):
+        """Wakes a waiting consumer without writing any data (e.g. on shutdown)."""
+        self.data_ready.set()
+
+    def wait(self, timeout=None):
+        """Waits for the producer to signal new data (or a wake()). Returns False on timeout."""
+        signalled = self.data_ready.wait(timeout)
+        # Clear before draining: anything written after this point sets it again
+        self.data_ready.clear()
+        return signalled
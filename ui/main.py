@@ -1,18 +1,36 @@
 import os
+import re
+import asyncio
+import bisect
 import sys
 import datetime
 from pathlib import Path
-from typing import List, Optional
-import zipfile
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
 import io
 import wave
-import gzip   # Added for compression/decompression
-import shutil # Added for streaming compression
+import zlib   # Added for decompression of legacy .wav.gz recordings
+import hashlib
+import shutil
+import stat
+import struct
+import tempfile
+import threading
+import weakref
+import concurrent.futures
+import zstandard
+
+try:
+    import soundfile as sf # Only needed to read .flac recordings
+except ImportError:
+    sf = None
+
+from zipstream import ZipStream, ZIP_STORED
 
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
 
 # Add the listening_service directory to sys.path to import its config
 SERVICE_DIR = Path(__file__).parent.parent / 'listening_service'
@@ -30,7 +48,22 @@ except ImportError as e:
         OUTPUT_DIR = "../recordings" # Relative guess
     listener_settings = FallbackSettings()
 
+class PageGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that leaves the /download* routes alone.
+
+    Those serve recordings and archives that are already compressed, so
+    gzipping them again would only burn CPU (and break Range requests).
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/download"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
 app = FastAPI()
+# Compress the rendered recordings page, which grows with the number of files
+app.add_middleware(PageGZipMiddleware, minimum_size=1000)
 
 # Use absolute path for templates based on this file's location
 TEMPLATES_DIR = Path(__file__).parent / "templates"
@@ -45,146 +78,568 @@ if not RECORDINGS_DIR.is_absolute():
 
 print(f"UI Service using recordings directory: {RECORDINGS_DIR}")
 
-class RecordingInfo(BaseModel):
+# Finished /download_all archives, reused while their recordings are unchanged
+ZIP_CACHE_DIR = RECORDINGS_DIR / ".cache"
+# Share of the free disk space (counting what the cache already holds) the
+# cached archives may take up together; the oldest are deleted beyond that
+ZIP_CACHE_DISK_FRACTION = 0.1
+
+# Compression level of combined downloads (zstd; fast, and better than gzip on PCM)
+ZSTD_LEVEL = 3
+
+# Frames decoded per read when combining recordings (256 KiB of 16-bit stereo)
+READ_BLOCK_FRAMES = 65536
+
+# Compressed bytes read at a time from legacy .wav.gz recordings
+GZIP_READ_SIZE = 1024 * 1024
+
+# Chunks a streamed download may produce ahead of what has been sent
+STREAM_PREFETCH = 8
+
+# Streamed downloads (zip/combined) running at once. Each holds a thread of
+# its own pool for its whole duration, so slow clients can never tie up the
+# default executor that asyncio.to_thread (directory scans, stats) relies on.
+MAX_CONCURRENT_STREAMS = 4
+STREAM_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_STREAMS, thread_name_prefix="download-stream")
+_stream_slots = threading.BoundedSemaphore(MAX_CONCURRENT_STREAMS)
+
+# Recording file extensions the listening service can produce, and how to serve them
+RECORDING_MEDIA_TYPES = {
+    ".wav.zst": "application/zstd",
+    ".wav.gz": "application/gzip",
+    ".flac": "audio/flac",
+}
+RECORDING_EXTENSIONS = tuple(RECORDING_MEDIA_TYPES)
+# YYYYMMDD_HHMMSS_to_HHMMSS plus one of the extensions; groups: date, start, end, extension
+RECORDING_FILENAME_RE = re.compile(
+    r'([0-9]{8})_([0-9]{6})_to_([0-9]{6})(' + '|'.join(map(re.escape, RECORDING_EXTENSIONS)) + r')\Z'
+)
+
+@dataclass(slots=True)
+class RecordingInfo:
     filename: str
     start_dt: datetime.datetime
     end_dt: datetime.datetime
-    start_str: str
-    end_str: str
     duration_sec: float
     filepath: Path
 
+    # Display strings are only needed for the recordings actually rendered,
+    # so they are formatted on access rather than for every scanned file
+    @property
+    def start_str(self) -> str:
+        return self.start_dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    @property
+    def end_str(self) -> str:
+        return self.end_dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    @property
+    def extension(self) -> str:
+        """The recording's format, e.g. 'wav.zst' (most browsers can't play these directly)."""
+        return self.filename.split('.', 1)[1]
+
 def parse_filename(filename: str, filepath: Path) -> Optional[RecordingInfo]:
-    """Parses start/end datetime and calculates duration from filename (.wav.gz)."""
-    # Expecting format like YYYYMMDD_HHMMSS_to_HHMMSS.wav.gz
-    if not filename.endswith(".wav.gz"):
+    """Parses start/end datetime and calculates duration from filename (.wav.zst, .wav.gz or .flac)."""
+    # Expecting format like YYYYMMDD_HHMMSS_to_HHMMSS.wav.zst
+    match = RECORDING_FILENAME_RE.match(filename)
+    if not match:
+        return None
+    date_part, start_part, end_part, _ = match.groups()
+    try:
+        # Fixed-width digit fields, so int() slices of them directly rather
+        # than going through strptime's format interpretation
+        year, month, day = int(date_part[0:4]), int(date_part[4:6]), int(date_part[6:8])
+        start_dt = datetime.datetime(year, month, day,
+                                     int(start_part[0:2]), int(start_part[2:4]), int(start_part[4:6]))
+        # Assume end time is on the same day unless it wraps past midnight
+        end_dt = datetime.datetime(year, month, day,
+                                   int(end_part[0:2]), int(end_part[2:4]), int(end_part[4:6]))
+        if end_dt < start_dt:
+             end_dt += datetime.timedelta(days=1)
+
+        # Calculate duration
+        duration = end_dt - start_dt
+        duration_sec = round(duration.total_seconds(), 1)
+
+        return RecordingInfo(
+            filename=filename, # Keep original filename, with extension
+            start_dt=start_dt,
+            end_dt=end_dt,
+            duration_sec=duration_sec,
+            filepath=filepath
+        )
+    except ValueError:
+        # Well-formed but not a real date/time, e.g. month 13
+        print(f"Error parsing filename: {filename}", file=sys.stderr)
         return None
-    base_filename = filename[:-len(".wav.gz")] # Remove .wav.gz
-    parts = base_filename.split('_to_')
-    if len(parts) == 2:
-        start_part, end_part = parts
-        try:
-            start_dt = datetime.datetime.strptime(start_part, '%Y%m%d_%H%M%S')
-            # Assume end time is on the same day unless it wraps past midnight
-            end_dt = datetime.datetime.strptime(f"{start_dt.strftime('%Y%m%d')}_{end_part}", '%Y%m%d_%H%M%S')
-            if end_dt < start_dt:
-                 end_dt += datetime.timedelta(days=1)
-
-            # Calculate duration
-            duration = end_dt - start_dt
-            duration_sec = round(duration.total_seconds(), 1)
-
-            return RecordingInfo(
-                filename=filename, # Keep original .wav.gz filename
-                start_dt=start_dt,
-                end_dt=end_dt,
-                start_str=start_dt.strftime('%Y-%m-%d %H:%M:%S'),
-                end_str=end_dt.strftime('%Y-%m-%d %H:%M:%S'),
-                duration_sec=duration_sec,
-                filepath=filepath
-            )
-        except ValueError:
-            print(f"Error parsing filename: {filename}", file=sys.stderr)
-            return None
-    return None
 
-def get_recordings(start_date: Optional[datetime.date] = None, end_date: Optional[datetime.date] = None) -> List[RecordingInfo]:
-    """Gets list of recordings (.wav.gz), optionally filtered by date range."""
-    recordings = []
-    if not RECORDINGS_DIR.exists() or not RECORDINGS_DIR.is_dir():
+# Parsed recordings of the last directory scan, keyed on the directory's
+# mtime: (st_mtime_ns, recordings sorted by start time). Replaced as a whole
+# so concurrent readers never see a half-updated cache.
+_recordings_cache = (None, [])
+
+def scan_recordings() -> List[RecordingInfo]:
+    """Gets all recordings (.wav.zst/.wav.gz/.flac), oldest first, rescanning the directory only when it changed."""
+    global _recordings_cache
+    try:
+        dir_stat = RECORDINGS_DIR.stat()
+    except OSError:
+        dir_stat = None
+    if dir_stat is None or not stat.S_ISDIR(dir_stat.st_mode):
         print(f"Warning: Recordings directory not found or not a directory: {RECORDINGS_DIR}")
         return []
 
-    for item in RECORDINGS_DIR.iterdir():
-        # Look for .wav.gz files
-        if item.is_file() and item.name.endswith('.wav.gz'):
-            info = parse_filename(item.name, item)
-            if info:
-                # Apply date filtering (inclusive)
-                recording_date = info.start_dt.date()
-                if start_date and recording_date < start_date:
-                    continue
-                if end_date and recording_date > end_date:
-                    continue
-                recordings.append(info)
-
-    # Sort by start time, newest first
-    recordings.sort(key=lambda r: r.start_dt, reverse=True)
-    return recordings
+    # Adding, removing or renaming a file updates the directory's mtime
+    cached_mtime, cached_recordings = _recordings_cache
+    if cached_mtime == dir_stat.st_mtime_ns:
+        return cached_recordings
 
-def get_recordings_in_range(start_dt: datetime.datetime, end_dt: datetime.datetime) -> List[RecordingInfo]:
-    """Gets list of recordings (.wav.gz) that overlap with the given datetime range."""
     recordings = []
-    if not RECORDINGS_DIR.exists() or not RECORDINGS_DIR.is_dir():
-        print(f"Warning: Recordings directory not found: {RECORDINGS_DIR}")
-        return []
-
-    for item in RECORDINGS_DIR.iterdir():
-        # Look for .wav.gz files
-        if item.is_file() and item.name.endswith('.wav.gz'):
-            info = parse_filename(item.name, item)
-            if info:
-                # Check for overlap: (StartA <= EndB) and (EndA >= StartB)
-                if info.start_dt <= end_dt and info.end_dt >= start_dt:
+    # scandir entries carry the file type from the directory listing itself,
+    # so checking is_file() doesn't cost a stat() per entry
+    with os.scandir(RECORDINGS_DIR) as entries:
+        for entry in entries:
+            # Look for recording files
+            if RECORDING_FILENAME_RE.match(entry.name) and entry.is_file():
+                info = parse_filename(entry.name, Path(entry.path))
+                if info:
                     recordings.append(info)
 
-    # Sort by start time, ASCENDING for concatenation
-    recordings.sort(key=lambda r: r.start_dt, reverse=False)
+    # Names start with a fixed-width YYYYMMDD_HHMMSS timestamp, so sorting by
+    # name orders by start time with plain string comparisons
+    recordings.sort(key=lambda r: r.filename)
+    _recordings_cache = (dir_stat.st_mtime_ns, recordings)
     return recordings
 
-def combine_wav_files(file_list: List[Path]) -> Optional[io.BytesIO]:
-    """Decompresses and combines multiple WAV files (.wav.gz) into a single uncompressed WAV in memory."""
+def get_recordings(start_date: Optional[datetime.date] = None, end_date: Optional[datetime.date] = None) -> List[RecordingInfo]:
+    """Gets list of recordings (.wav.zst/.wav.gz/.flac), optionally filtered by date range."""
+    recordings = scan_recordings()
+    # The scan is sorted by start time, so the date range (inclusive) is a
+    # contiguous slice: bisect for its ends instead of testing every recording
+    start_date_key = lambda r: r.start_dt.date()
+    lo = bisect.bisect_left(recordings, start_date, key=start_date_key) if start_date else 0
+    hi = bisect.bisect_right(recordings, end_date, key=start_date_key) if end_date else len(recordings)
+    # Newest first
+    return recordings[lo:hi][::-1]
+
+def get_recordings_in_range(start_dt: datetime.datetime, end_dt: datetime.datetime) -> List[RecordingInfo]:
+    """Gets list of recordings (.wav.zst/.wav.gz/.flac) that overlap with the given datetime range."""
+    recordings = scan_recordings()
+    # Recordings starting after the range can't overlap it; skip them by bisection
+    hi = bisect.bisect_right(recordings, end_dt, key=lambda r: r.start_dt)
+    # Check for overlap: (StartA <= EndB) and (EndA >= StartB)
+    # Already sorted by start time, ASCENDING for concatenation
+    return [info for info in recordings[:hi] if info.end_dt >= start_dt]
+
+def wav_header(nchannels: int, sampwidth: int, framerate: int, nframes: int) -> bytes:
+    """Returns the canonical 44-byte PCM WAV header for `nframes` frames of audio."""
+    block_align = nchannels * sampwidth
+    data_size = nframes * block_align
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size + (data_size & 1), b'WAVE',
+        b'fmt ', 16, 1, nchannels, framerate, framerate * block_align, block_align, sampwidth * 8,
+        b'data', data_size,
+    )
+
+class GzipInflateReader(io.RawIOBase):
+    """Decompresses a single-member gzip file (.wav.gz recording) front to back.
+
+    gzip.GzipFile pulls the compressed data 8 KiB at a time through a Python
+    read loop and updates the CRC from Python. Here large reads are handed to
+    zlib, which parses the gzip framing and checks the CRC itself in C.
+    """
+
+    def __init__(self, fileobj, read_size: int = GZIP_READ_SIZE):
+        self._fileobj = fileobj
+        self._read_size = read_size
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) # Expect a gzip header
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._decompressor.eof:
+            # Input zlib held back last time because the output was full
+            compressed = self._decompressor.unconsumed_tail
+            if not compressed:
+                compressed = self._fileobj.read(self._read_size)
+                if not compressed:
+                    raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+            data = self._decompressor.decompress(compressed, len(buffer))
+            if data:
+                buffer[:len(data)] = data
+                return len(data)
+        return 0
+
+    def close(self):
+        if not self.closed:
+            self._fileobj.close()
+        super().close()
+
+def open_compressed_wav(filepath: Path):
+    """Opens a compressed WAV recording (.wav.zst or legacy .wav.gz) as a decompressing binary stream."""
+    if filepath.name.endswith(".wav.zst"):
+        return zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'))
+    return io.BufferedReader(GzipInflateReader(open(filepath, 'rb')))
+
+def probe_recording(filepath: Path):
+    """Reads only the format and length of a recording: ((nchannels, sampwidth, framerate), nframes)."""
+    if filepath.name.endswith(".flac"):
+        if sf is None:
+            raise RuntimeError("reading .flac recordings requires the 'soundfile' package")
+        info = sf.info(str(filepath))
+        # iter_recording_frames always decodes FLAC to 16-bit samples
+        return (info.channels, 2, info.samplerate), info.frames
+
+    # Only the WAV header is decompressed
+    with open_compressed_wav(filepath) as compressed_f:
+        with wave.open(compressed_f, 'rb') as infile:
+            return (infile.getnchannels(), infile.getsampwidth(), infile.getframerate()), infile.getnframes()
+
+def iter_recording_frames(filepath: Path, block_frames: int = READ_BLOCK_FRAMES):
+    """Yields the raw interleaved 16-bit frames of a recording (.wav.zst, .wav.gz or .flac) in blocks."""
+    if filepath.name.endswith(".flac"):
+        if sf is None:
+            raise RuntimeError("reading .flac recordings requires the 'soundfile' package")
+        # Each block is a C-contiguous int16 array, written out without a bytes copy
+        yield from sf.blocks(str(filepath), blocksize=block_frames, dtype='int16', always_2d=True)
+        return
+
+    # Open the compressed file and pass the file-like object to wave.open
+    with open_compressed_wav(filepath) as compressed_f:
+        with wave.open(compressed_f, 'rb') as infile:
+            while frames := infile.readframes(block_frames):
+                yield frames
+
+def iter_frames_exactly(filepath: Path, nframes: int, params, block_frames: int = READ_BLOCK_FRAMES):
+    """Yields exactly `nframes` frames of a recording, as probed, whatever its audio turns out to hold.
+
+    The combined WAV header is sent before the audio is decoded, so a file
+    that is truncated or corrupt past its header must still fill its share:
+    its missing frames are padded with silence (and extra ones dropped).
+    """
+    nchannels, sampwidth, _ = params
+    frame_size = nchannels * sampwidth
+    remaining = nframes * frame_size
+    frames_iter = iter_recording_frames(filepath, block_frames)
+    try:
+        while remaining:
+            try:
+                frames = next(frames_iter, None)
+            except Exception as e:
+                print(f"Error decoding {filepath.name}, padding the rest with silence: {e}", file=sys.stderr)
+                break
+            if frames is None:
+                print(f"Warning: {filepath.name} ended {remaining // frame_size} frames early, padding with silence",
+                      file=sys.stderr)
+                break
+            data = memoryview(frames).cast('B')[:remaining]
+            remaining -= len(data)
+            yield data
+    finally:
+        frames_iter.close()
+
+    # 8-bit WAV samples are unsigned, centred on 0x80
+    silence = (b'\x80' if sampwidth == 1 else b'\x00') * (block_frames * frame_size)
+    while remaining:
+        data = silence[:remaining]
+        remaining -= len(data)
+        yield data
+
+def combine_wav_files(file_list: List[Path]) -> Optional[Iterator[bytes]]:
+    """Combines multiple recordings into a single zstd-compressed WAV, generated piece by piece.
+
+    Every file is probed (format and length only) before anything is produced,
+    so incompatible inputs are rejected up front and the WAV header can carry
+    the final length. The audio is then decoded in fixed-size blocks and
+    compressed in a single pass, so memory use doesn't grow with the length
+    of the recordings. A file that fails to decode partway through is padded
+    with silence to its probed length, so the header stays correct.
+    Returns None if there is nothing valid to combine.
+    """
     if not file_list:
         return None
 
-    output_buffer = io.BytesIO() # This will hold the uncompressed combined WAV data
-    first_file = True
     params = None
+    valid_files = []
+    total_frames = 0
 
     try:
-        with wave.open(output_buffer, 'wb') as outfile:
-            for filepath in file_list:
-                if not filepath.exists() or not filepath.name.endswith('.wav.gz'):
-                    print(f"Warning: File not found or not .wav.gz: {filepath}", file=sys.stderr)
-                    continue
-
-                try:
-                    # Open the gzipped file and pass the file-like object to wave.open
-                    with gzip.open(filepath, 'rb') as compressed_f:
-                        with wave.open(compressed_f, 'rb') as infile:
-                            current_params = infile.getparams()
-                            if first_file:
-                                params = current_params
-                                outfile.setparams(params)
-                                first_file = False
-                            elif current_params != params:
-                                print(f"Error: WAV file {filepath.name} has incompatible parameters.", file=sys.stderr)
-                                print(f"Expected: {params}", file=sys.stderr)
-                                print(f"Got: {current_params}", file=sys.stderr)
-                                return None # Abort on incompatible parameters
-
-                            # Read and write frame data
-                            frames = infile.readframes(infile.getnframes())
-                            outfile.writeframes(frames)
-                except gzip.BadGzipFile:
-                    print(f"Error: File is not a valid Gzip file: {filepath.name}", file=sys.stderr)
-                    continue # Skip corrupted files
-                except EOFError:
-                    print(f"Error: Gzip file ended unexpectedly (possibly corrupt): {filepath.name}", file=sys.stderr)
-                    continue # Skip corrupted files
-                except wave.Error as e:
-                    print(f"Error processing decompressed WAV data from {filepath.name}: {e}", file=sys.stderr)
-                    return None # Abort if WAV content is bad
+        for filepath in file_list:
+            if not filepath.exists() or not filepath.name.endswith(RECORDING_EXTENSIONS):
+                print(f"Warning: File not found or not a recording: {filepath}", file=sys.stderr)
+                continue
+
+            try:
+                current_params, nframes = probe_recording(filepath)
+                # Only the format has to match; lengths naturally differ
+                if params is None:
+                    params = current_params
+                elif current_params != params:
+                    print(f"Error: Recording {filepath.name} has incompatible parameters.", file=sys.stderr)
+                    print(f"Expected (channels, sampwidth, rate): {params}", file=sys.stderr)
+                    print(f"Got: {current_params}", file=sys.stderr)
+                    return None # Abort on incompatible parameters
+
+                valid_files.append((filepath, nframes))
+                total_frames += nframes
+            except zlib.error:
+                print(f"Error: File is not a valid Gzip file: {filepath.name}", file=sys.stderr)
+                continue # Skip corrupted files
+            except EOFError:
+                print(f"Error: Compressed file ended unexpectedly (possibly corrupt): {filepath.name}", file=sys.stderr)
+                continue # Skip corrupted files
+            except zstandard.ZstdError as e:
+                print(f"Error: File is not a valid zstd file: {filepath.name} ({e})", file=sys.stderr)
+                continue # Skip corrupted files
+            except RuntimeError as e:
+                # soundfile missing, or libsndfile failed to decode
+                print(f"Error reading {filepath.name}: {e}", file=sys.stderr)
+                continue
+            except wave.Error as e:
+                print(f"Error processing decompressed WAV data from {filepath.name}: {e}", file=sys.stderr)
+                return None # Abort if WAV content is bad
 
     except Exception as e:
         print(f"Unexpected error during WAV combination: {e}", file=sys.stderr)
         return None
 
-    if first_file: # No valid files processed
+    if not valid_files: # No valid files processed
         return None
 
-    output_buffer.seek(0)
-    return output_buffer # Return uncompressed combined data
+    def generate():
+        # The compressor only ever appends to the sink, which is emptied
+        # whenever it has produced output
+        sink = io.BytesIO()
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        try:
+            with compressor.stream_writer(sink, closefd=False) as compressed_out:
+                # The header is final up front, so the output never has to be seeked back
+                compressed_out.write(wav_header(*params, total_frames))
+                for filepath, nframes in valid_files:
+                    for frames in iter_frames_exactly(filepath, nframes, params):
+                        compressed_out.write(frames)
+                        if sink.tell():
+                            yield sink.getvalue()
+                            sink.seek(0)
+                            sink.truncate()
+            yield sink.getvalue() # End of the zstd frame
+        except Exception as e:
+            # Only the output side can fail here (inputs are padded instead);
+            # the response has already started, so all we can do is cut it short
+            print(f"Error while streaming combined WAV data: {e}", file=sys.stderr)
+            raise
+
+    return generate()
+
+def build_zip_stream(recordings: List[RecordingInfo]) -> ZipStream:
+    """Prepares a ZIP archive of the given recordings, generated lazily while it is iterated."""
+    # Recordings are already compressed (zstd/gzip/FLAC); deflating them again costs
+    # a full zlib pass for next to no size reduction, so store them as-is.
+    # The archive is generated while it is being sent, one file at a time,
+    # instead of being built in memory first. Storing also means its final
+    # size is known up front (sized=True).
+    zip_stream = ZipStream(compress_type=ZIP_STORED, sized=True)
+    for recording in recordings:
+        if recording.filepath.exists():
+            # Add the compressed recording to the zip archive
+            zip_stream.add_path(str(recording.filepath), arcname=recording.filename)
+    return zip_stream
+
+def zip_cache_path(recordings: List[RecordingInfo]) -> Path:
+    """Returns where the archive of exactly these recordings, as they are on disk now, is cached."""
+    # Recordings are never modified once written, but include size and mtime
+    # so a file that was still being written doesn't match its final version
+    key = hashlib.blake2b(digest_size=16)
+    for recording in recordings:
+        try:
+            file_stat = recording.filepath.stat()
+        except OSError:
+            continue # Left out of the archive by build_zip_stream as well
+        key.update(f"{recording.filename}|{file_stat.st_size}|{file_stat.st_mtime_ns}\n".encode())
+    return ZIP_CACHE_DIR / f"{key.hexdigest()}.zip"
+
+def cached_archives() -> list:
+    """Returns (path, size) of the cached archives, most recently created first."""
+    cached = []
+    for path in ZIP_CACHE_DIR.glob("*.zip"):
+        try:
+            st = path.stat()
+        except FileNotFoundError: # Pruned meanwhile
+            continue
+        cached.append((st.st_mtime_ns, path, st.st_size))
+    cached.sort(reverse=True)
+    return [(path, size) for _, path, size in cached]
+
+def zip_cache_budget(cached_bytes: int) -> int:
+    """Bytes the zip cache may use: ZIP_CACHE_DISK_FRACTION of the space it could have."""
+    free = shutil.disk_usage(RECORDINGS_DIR).free
+    return int((free + cached_bytes) * ZIP_CACHE_DISK_FRACTION)
+
+def zip_cache_has_room(size: int) -> bool:
+    """Whether an archive of `size` bytes fits the zip cache budget at all."""
+    try:
+        cached_bytes = sum(size for _, size in cached_archives()) if ZIP_CACHE_DIR.is_dir() else 0
+        return size <= zip_cache_budget(cached_bytes)
+    except OSError as e:
+        print(f"Warning: Could not check zip cache space: {e}", file=sys.stderr)
+        return False
+
+def prune_zip_cache():
+    """Deletes the oldest cached archives until the rest fit the zip cache budget."""
+    try:
+        cached = cached_archives()
+        budget = zip_cache_budget(sum(size for _, size in cached))
+        kept_bytes = 0
+        for path, size in cached:
+            kept_bytes += size
+            if kept_bytes > budget:
+                path.unlink(missing_ok=True)
+    except OSError as e:
+        print(f"Warning: Could not prune zip cache: {e}", file=sys.stderr)
+
+def open_cached_archive(cache_path: Path):
+    """Opens a cached archive for serving: (fd, stat_result), or None if it isn't cached.
+
+    The caller owns the descriptor. While it is open the archive stays
+    readable through /dev/fd even if another download prunes it.
+    """
+    try:
+        fd = os.open(cache_path, os.O_RDONLY)
+    except OSError: # Not cached, or pruned just now
+        return None
+    try:
+        file_stat = os.fstat(fd)
+    except OSError:
+        os.close(fd)
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        os.close(fd)
+        return None
+    return fd, file_stat
+
+def cache_while_streaming(chunks: Iterator[bytes], cache_path: Path) -> Iterator[bytes]:
+    """Passes chunks through unchanged, saving them to cache_path once all of them went through.
+
+    Caching is best effort: if the copy can't be written the download simply
+    continues uncached. A partial copy (e.g. the client disconnected) is
+    discarded, so only complete archives are ever served from the cache.
+    """
+    try:
+        ZIP_CACHE_DIR.mkdir(exist_ok=True)
+        # A fresh file per download, also across uvicorn worker processes, so
+        # two copies of the same archive are never written into one file
+        fd, tmp_name = tempfile.mkstemp(dir=ZIP_CACHE_DIR, prefix=f"{cache_path.name}.", suffix=".tmp")
+        tmp_path = Path(tmp_name)
+        cache_file = os.fdopen(fd, 'wb')
+    except OSError as e:
+        print(f"Warning: Not caching {cache_path.name}: {e}", file=sys.stderr)
+        yield from chunks
+        return
+
+    try:
+        for chunk in chunks:
+            if cache_file:
+                try:
+                    cache_file.write(chunk)
+                except OSError as e:
+                    print(f"Warning: Not caching {cache_path.name}: {e}", file=sys.stderr)
+                    cache_file.close()
+                    cache_file = None
+            yield chunk
+        if cache_file:
+            cache_file.close()
+            cache_file = None
+            try:
+                os.replace(tmp_path, cache_path)
+                prune_zip_cache()
+            except OSError as e:
+                print(f"Warning: Not caching {cache_path.name}: {e}", file=sys.stderr)
+    finally:
+        if cache_file:
+            cache_file.close()
+        tmp_path.unlink(missing_ok=True) # Already renamed if the copy was complete
+
+class StreamSlot:
+    """One of the MAX_CONCURRENT_STREAMS download stream slots.
+
+    `release()` gives it back, at most once. If whoever holds the slot drops
+    it without releasing it (a response that was never iterated), it is
+    released when it is garbage collected.
+    """
+    __slots__ = ("release", "__weakref__")
+
+    def __init__(self):
+        self.release = weakref.finalize(self, _stream_slots.release)
+
+def stream_in_background(iterator):
+    """Wraps a blocking iterator for StreamingResponse, reserving one of the download stream slots.
+
+    Raises HTTPException(503) if MAX_CONCURRENT_STREAMS downloads are already
+    running. The slot is released when the worker thread producing the
+    stream is done, or, if the response never starts iterating it, when it
+    is garbage collected.
+    """
+    if not _stream_slots.acquire(blocking=False):
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
+        raise HTTPException(status_code=503, detail="Too many downloads in progress, try again later.",
+                            headers={"Retry-After": "10"})
+    return _iterate_in_background(iterator, StreamSlot())
+
+def _log_producer_error(future: concurrent.futures.Future):
+    """Reports anything a download stream producer raised outside its own error handling."""
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Error in download stream worker: {future.exception()!r}", file=sys.stderr)
+
+async def _iterate_in_background(iterator, slot: StreamSlot, prefetch: int = STREAM_PREFETCH):
+    """Runs a blocking iterator on STREAM_EXECUTOR, reading ahead of the consumer.
+
+    Starlette pulls a sync iterator one item at a time, so producing a chunk
+    (disk reads, decompression) and sending the previous one never overlap.
+    Here the worker keeps up to `prefetch` chunks ready while the event loop
+    sends, and stops early if the client goes away. The worker releases the
+    stream slot itself once it has let go of the iterator, so a new stream
+    is only admitted when a pool thread is actually free for it.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue()
+    slots = threading.Semaphore(prefetch) # Bounds the read-ahead
+    stopped = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for chunk in iterator:
+                slots.acquire()
+                if stopped.is_set():
+                    return
+                loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+            loop.call_soon_threadsafe(chunks.put_nowait, done)
+        except Exception as e:
+            loop.call_soon_threadsafe(chunks.put_nowait, e)
+        finally:
+            # Release the iterator's files from this thread, also when stopped early
+            try:
+                close = getattr(iterator, "close", None)
+                if close:
+                    close()
+            finally:
+                slot.release()
+
+    try:
+        # Logged from the worker thread, so it is reported even if the loop is gone
+        STREAM_EXECUTOR.submit(produce).add_done_callback(_log_producer_error)
+        while (chunk := await chunks.get()) is not done:
+            if isinstance(chunk, Exception):
+                raise chunk
+            slots.release()
+            yield chunk
+    finally:
+        stopped.set()
+        slots.release() # Wake the worker if it is waiting for room
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request, start_date: Optional[str] = None, end_date: Optional[str] = None):
@@ -200,7 +655,9 @@ async def read_root(request: Request, start_date: Optional[str] = None, end_date
         # Handle invalid date format gracefully, maybe show an error or ignore
         pass # Or: raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
 
-    recordings_list = get_recordings(start_date=s_date, end_date=e_date)
+    # Directory scans and file I/O run in a worker thread so one slow request
+    # doesn't stall every other request on the event loop
+    recordings_list = await asyncio.to_thread(get_recordings, start_date=s_date, end_date=e_date)
     return templates.TemplateResponse(
         "index.html",
         {
@@ -213,16 +670,27 @@ async def read_root(request: Request, start_date: Optional[str] = None, end_date
 
 @app.get("/download/{filename}")
 async def download_recording(filename: str):
-    """Serves a single compressed recording file (.wav.gz) for download."""
-    if ".." in filename or "/" in filename or not filename.endswith(".wav.gz"):
+    """Serves a single compressed recording file (.wav.zst/.wav.gz/.flac) for download."""
+    # Only exact recording names, which also rules out any path traversal
+    match = RECORDING_FILENAME_RE.match(filename)
+    if not match:
         raise HTTPException(status_code=400, detail="Invalid filename.")
 
     file_path = RECORDINGS_DIR / filename
-    if file_path.exists() and file_path.is_file():
-        # Serve the compressed file directly
+    try:
+        file_stat = await asyncio.to_thread(file_path.stat)
+    except OSError:
+        file_stat = None
+    if file_stat is not None and stat.S_ISREG(file_stat.st_mode):
+        # Serve the compressed file directly. FileResponse answers Range
+        # requests itself (206 Partial Content, Accept-Ranges/Content-Range),
+        # so interrupted downloads and seeking clients don't refetch the file.
+        # Handing it our stat result saves it a second stat() of the file.
+        extension = match.group(4)
         return FileResponse(
             file_path,
-            media_type='application/gzip', # Correct media type for gzip
+            stat_result=file_stat,
+            media_type=RECORDING_MEDIA_TYPES[extension],
             filename=filename
         )
     else:
@@ -230,7 +698,7 @@ async def download_recording(filename: str):
 
 @app.get("/download_combined")
 async def download_combined_wav(start_dt: str, end_dt: str):
-    """Finds recordings (.wav.gz), decompresses, combines, recompresses, and streams the result."""
+    """Finds recordings (.wav.zst/.wav.gz/.flac) and streams them combined into a single zstd-compressed WAV."""
     try:
         start_datetime = datetime.datetime.fromisoformat(start_dt)
         end_datetime = datetime.datetime.fromisoformat(end_dt)
@@ -242,7 +710,7 @@ async def download_combined_wav(start_dt: str, end_dt: str):
 
     print(f"Requesting combined compressed WAV from {start_datetime} to {end_datetime}")
 
-    recordings_to_combine = get_recordings_in_range(start_datetime, end_datetime)
+    recordings_to_combine = await asyncio.to_thread(get_recordings_in_range, start_datetime, end_datetime)
 
     if not recordings_to_combine:
         raise HTTPException(status_code=404, detail="No recordings found overlapping the specified time range.")
@@ -251,40 +719,30 @@ async def download_combined_wav(start_dt: str, end_dt: str):
     for rec in recordings_to_combine:
         print(f"  - {rec.filename}")
 
-    # Decompress and combine into an uncompressed WAV buffer
-    uncompressed_wav_buffer = combine_wav_files([rec.filepath for rec in recordings_to_combine])
+    # Decompress, combine and re-compress in a single pass while streaming.
+    # Probing the inputs opens every file, so it runs in a worker thread, as
+    # does generating the output (on the download stream pool) while earlier
+    # chunks are being sent.
+    combined_stream = await asyncio.to_thread(combine_wav_files, [rec.filepath for rec in recordings_to_combine])
 
-    if uncompressed_wav_buffer is None:
+    if combined_stream is None:
         raise HTTPException(status_code=500, detail="Failed to combine WAV files. Check server logs for incompatible or corrupt files.")
 
-    # Re-compress the combined buffer using gzip
-    compressed_output_buffer = io.BytesIO()
-    try:
-        with gzip.open(compressed_output_buffer, 'wb') as f_out:
-            shutil.copyfileobj(uncompressed_wav_buffer, f_out)
-    except Exception as e:
-        print(f"Error re-compressing combined WAV data: {e}", file=sys.stderr)
-        raise HTTPException(status_code=500, detail="Failed to re-compress combined audio data.")
-    finally:
-        uncompressed_wav_buffer.close() # Clean up the intermediate buffer
-
-    compressed_output_buffer.seek(0)
-
     # Create filename for the combined compressed download
     start_str = start_datetime.strftime('%Y%m%d_%H%M%S')
     end_str = end_datetime.strftime('%Y%m%d_%H%M%S')
-    # Add .wav.gz extension to the final filename
-    combined_filename = f"combined_recording_{start_str}_to_{end_str}.wav.gz"
+    # Add .wav.zst extension to the final filename
+    combined_filename = f"combined_recording_{start_str}_to_{end_str}.wav.zst"
 
     return StreamingResponse(
-        compressed_output_buffer, # Stream the compressed data
-        media_type="application/gzip", # Correct media type
+        stream_in_background(combined_stream), # Stream the compressed data
+        media_type="application/zstd", # Correct media type
         headers={"Content-Disposition": f"attachment; filename={combined_filename}"}
     )
 
 @app.get("/download_all")
 async def download_all_recordings(start_date: Optional[str] = None, end_date: Optional[str] = None):
-    """Streams a ZIP file containing compressed recordings (.wav.gz) filtered by date range."""
+    """Streams a ZIP file containing compressed recordings (.wav.zst/.wav.gz/.flac) filtered by date range."""
     s_date = None
     e_date = None
     try:
@@ -295,23 +753,12 @@ async def download_all_recordings(start_date: Optional[str] = None, end_date: Op
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
 
-    # get_recordings now returns .wav.gz files
-    recordings_list = get_recordings(start_date=s_date, end_date=e_date)
+    # get_recordings returns .wav.zst, .wav.gz and .flac files
+    recordings_list = await asyncio.to_thread(get_recordings, start_date=s_date, end_date=e_date)
 
     if not recordings_list:
         raise HTTPException(status_code=404, detail="No recordings found for the selected date range.")
 
-    zip_buffer = io.BytesIO()
-    # Use ZIP_STORED if files are already compressed, or ZIP_DEFLATED for further zip compression
-    # Let's use ZIP_DEFLATED for potentially better overall compression of the archive.
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for recording in recordings_list:
-            if recording.filepath.exists():
-                # Add the .wav.gz file to the zip archive
-                zipf.write(recording.filepath, arcname=recording.filename)
-
-    zip_buffer.seek(0)
-
     # Create a filename for the zip download
     zip_filename = f"recordings"
     if s_date:
@@ -320,10 +767,38 @@ async def download_all_recordings(start_date: Optional[str] = None, end_date: Op
         zip_filename += f"_to_{e_date.strftime('%Y%m%d')}"
     zip_filename += ".zip"
 
+    # The same recordings always produce the same archive, so a previous
+    # download of them can be sent as a plain file (with Range support).
+    # Another download may prune it at any time, so it is opened here and
+    # served through that descriptor (FileResponse reopens /dev/fd/N, which
+    # still works once the name is gone). If it is already gone the archive
+    # is simply streamed (and cached) again.
+    cache_path = await asyncio.to_thread(zip_cache_path, recordings_list)
+    cached = await asyncio.to_thread(open_cached_archive, cache_path)
+    if cached is not None:
+        fd, cache_stat = cached
+        response = FileResponse(f"/dev/fd/{fd}", stat_result=cache_stat, media_type="application/zip",
+                                filename=zip_filename)
+        # Closed once the response is done with, however the request ended
+        weakref.finalize(response, os.close, fd)
+        return response
+
+    # Adding the files stats each of them; keep that off the event loop
+    zip_stream = await asyncio.to_thread(build_zip_stream, recordings_list)
+
+    # Read the next files while the previous chunks go out, keeping a copy
+    # if the archive fits in the space the cache may use
+    chunks = iter(zip_stream)
+    if await asyncio.to_thread(zip_cache_has_room, len(zip_stream)):
+        chunks = cache_while_streaming(chunks, cache_path)
+
     return StreamingResponse(
-        zip_buffer,
+        stream_in_background(chunks),
         media_type="application/zip",
-        headers={"Content-Disposition": f"attachment; filename={zip_filename}"}
+        headers={
+            "Content-Disposition": f"attachment; filename={zip_filename}",
+            "Content-Length": str(len(zip_stream)),
+        }
     )
 
 # Basic entry point for running with uvicorn (for development)